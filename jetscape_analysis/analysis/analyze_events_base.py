@@ -14,14 +14,19 @@ See README for pre-requisites.
 from __future__ import print_function
 
 # General
+import concurrent.futures
 import os
+import queue
 import subprocess
 import sys
+import threading
 import tqdm
 import yaml
+from numba import jit
 
 # Analysis
 import itertools
+import numpy as np
 import ROOT
 
 # Fastjet via python (from external library heppy)
@@ -73,7 +78,19 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
         self.progress_bar = config['progress_bar']
         self.scale_histograms = config['scale_histograms']
         self.merge_histograms = config['merge_histograms']
-        
+
+        # Number of processes to dispatch the pt-hat bins across (default: serial)
+        if 'n_workers' in config:
+            self.n_workers = config['n_workers']
+        else:
+            self.n_workers = 1
+
+        # Number of hadd workers for the final merge (default: one per core)
+        if 'merge_workers' in config:
+            self.merge_workers = config['merge_workers']
+        else:
+            self.merge_workers = os.cpu_count()
+
         self.event_id = 0
 
     # ---------------------------------------------------------------
@@ -92,62 +109,101 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
         n_combinations_per_pthat = int(len(parameter_combinations)/len(self.pt_hat_bins))
         parameter_combinations = parameter_combinations[:-n_combinations_per_pthat]
 
-        # Loop through all parameter combinations
+        # Build the output-directory label formatter once, with the parameter
+        # labels inlined, so the loop below only calls str.format per combination
+        label_template = '{0}' + ''.join('_{}{{{}}}'.format(label, i + 1)
+                                         for i, label in enumerate(parameter_labels[1:]))
+        format_label = label_template.format
+
+        # Build list of (pt_hat_bin, dir_label) jobs, one per parameter combination
+        jobs = []
         for index, parameter_combination in enumerate(parameter_combinations):
-        
-            self.pt_hat_bin = int(index / n_combinations_per_pthat)
-            if self.pt_hat_bin < len(self.pt_hat_bins) - 1:
-                pt_hat_min = self.pt_hat_bins[self.pt_hat_bin]
-                pt_hat_max = self.pt_hat_bins[self.pt_hat_bin + 1]
-            else:
+
+            pt_hat_bin = int(index / n_combinations_per_pthat)
+            if pt_hat_bin >= len(self.pt_hat_bins) - 1:
                 continue
-            if index % n_combinations_per_pthat == 0:
-                print('Analyzing pt-hat: {} - {} ...'.format(pt_hat_min, pt_hat_max))
-
-            # Create label for output directory
-            dir_label = ''
-            for index, value in enumerate(parameter_combination):
-                if index == 0:
-                    dir_label += str(self.pt_hat_bin)
-                    continue
-                dir_label += '_'
-                dir_label += parameter_labels[index]
-                dir_label += str(value)
-            if len(parameter_combination) > 1:
-                print('    Analyzing {}'.format(dir_label))
-                
-            # Create outputDir for each bin
-            self.output_dir_bin = '{}{}'.format(self.output_dir, dir_label)
-            if not self.output_dir_bin.endswith("/"):
-                self.output_dir_bin = self.output_dir_bin + "/"
-            if not os.path.exists(self.output_dir_bin):
-                os.makedirs(self.output_dir_bin)
-    
-            # Read JETSCAPE output, get hadrons, do jet finding, and write histograms to ROOT file
-            input_dir_bin = '{}{}'.format(self.input_dir, dir_label)
-            if self.reader_type == 'hepmc':
-                self.input_file = os.path.join(input_dir_bin, 'test_out.{}'.format(self.reader_type))
-            elif self.reader_type == 'ascii':
-                self.input_file = os.path.join(input_dir_bin, 'test_out.dat')
-                self.input_file_hadrons = os.path.join(input_dir_bin, 'FinalStateHadrons.txt')
-                self.input_file_partons = os.path.join(input_dir_bin, 'FinalStatePartons.txt')
-            self.run_jetscape_analysis()
-
-            # Scale histograms according to pthard bins cross-section
-            if self.scale_histograms:
-                print("Scaling pt-hat bins...")
-                scale_histograms.scale_histograms(self.output_dir_bin, self.pt_hat_bin, bRemoveOutliers=False)
+
+            dir_label = format_label(pt_hat_bin, *parameter_combination[1:])
+            jobs.append((pt_hat_bin, dir_label))
+
+        # Warm the numba kernels once, so the bins reuse the on-disk
+        # compilation cache instead of JIT-compiling per bin
+        warm_kernels()
+
+        # The jobs are independent, so dispatch them across processes
+        # (threads don't work here, since ROOT has global internal state)
+        if self.n_workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.n_workers, initializer=warm_kernels) as executor:
+                results = [executor.submit(self.analyze_bin, pt_hat_bin, dir_label) for pt_hat_bin, dir_label in jobs]
+                for result in concurrent.futures.as_completed(results):
+                    result.result()
+        else:
+            for pt_hat_bin, dir_label in jobs:
+                self.analyze_bin(pt_hat_bin, dir_label)
 
         # Merge all pthard bins into a single output file
+        # Use hadd's parallel merge when available (ROOT >= 6.10), and force-overwrite
         if self.merge_histograms:
-            cmd = "hadd {}AnalysisResultsFinal.root {}*/AnalysisResults.root".format(self.output_dir, self.output_dir)
+            merge_options = '-f'
+            if self.merge_workers > 1 and self.hadd_supports_parallel():
+                merge_options += ' -j {}'.format(self.merge_workers)
+            cmd = "hadd {} {}AnalysisResultsFinal.root {}*/AnalysisResults.root".format(merge_options, self.output_dir, self.output_dir)
             subprocess.run(cmd, check=True, shell=True)
 
+    # ---------------------------------------------------------------
+    # Check whether hadd supports parallel merging (ROOT >= 6.10)
+    # ---------------------------------------------------------------
+    def hadd_supports_parallel(self):
+
+        try:
+            probe = subprocess.run(['hadd', '--help'], capture_output=True, text=True)
+        except OSError:
+            return False
+        return '-j' in probe.stdout + probe.stderr
+
+    # ---------------------------------------------------------------
+    # Process a single parameter combination
+    # (must be picklable, since it may run in a worker process)
+    # ---------------------------------------------------------------
+    def analyze_bin(self, pt_hat_bin, dir_label):
+
+        self.pt_hat_bin = pt_hat_bin
+        pt_hat_min = self.pt_hat_bins[pt_hat_bin]
+        pt_hat_max = self.pt_hat_bins[pt_hat_bin + 1]
+        print('Analyzing pt-hat: {} - {} ...'.format(pt_hat_min, pt_hat_max))
+        if '_' in dir_label:
+            print('    Analyzing {}'.format(dir_label))
+
+        # Create outputDir for each bin
+        self.output_dir_bin = '{}{}'.format(self.output_dir, dir_label)
+        if not self.output_dir_bin.endswith("/"):
+            self.output_dir_bin = self.output_dir_bin + "/"
+        if not os.path.exists(self.output_dir_bin):
+            os.makedirs(self.output_dir_bin)
+
+        # Read JETSCAPE output, get hadrons, do jet finding, and write histograms to ROOT file
+        input_dir_bin = '{}{}'.format(self.input_dir, dir_label)
+        if self.reader_type == 'hepmc':
+            self.input_file = os.path.join(input_dir_bin, 'test_out.{}'.format(self.reader_type))
+        elif self.reader_type == 'ascii':
+            self.input_file = os.path.join(input_dir_bin, 'test_out.dat')
+            self.input_file_hadrons = os.path.join(input_dir_bin, 'FinalStateHadrons.txt')
+            self.input_file_partons = os.path.join(input_dir_bin, 'FinalStatePartons.txt')
+        self.run_jetscape_analysis()
+
+        # Scale histograms according to pthard bins cross-section
+        if self.scale_histograms:
+            print("Scaling pt-hat bins...")
+            scale_histograms.scale_histograms(self.output_dir_bin, self.pt_hat_bin, bRemoveOutliers=False)
+
     # ---------------------------------------------------------------
     # Main processing function for a single pt-hat bin
     # ---------------------------------------------------------------
     def run_jetscape_analysis(self):
 
+        self.event_id = 0
+        self.xsec = None
+
         # Create reader class
         if self.reader_type == 'hepmc':
             self.reader = reader_hepmc.ReaderHepMC(self.input_file)
@@ -157,15 +213,38 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
         # Initialize output objects
         self.initialize_output_objects()
 
+        # Read events on a background thread feeding a bounded queue, so the
+        # parse (mostly numpy C code, which releases the GIL) overlaps with
+        # jet finding and histogram filling here
+        event_queue = queue.Queue(maxsize=64)
+        reader_thread = threading.Thread(target=self.read_events, args=(event_queue,), daemon=True)
+        reader_thread.start()
+
         # Iterate through events
-        if self.progress_bar:
-            pbar = tqdm.tqdm(range(self.n_event_max))
-        for event in self.reader(n_events=self.n_event_max):
-        
+        # Progress-bar updates are batched -- a per-event update() costs a
+        # lock and a stderr write, which adds up over millions of events
+        pbar = tqdm.tqdm(total=self.n_event_max) if self.progress_bar else None
+        pbar_batch = 1000
+        n_since_update = 0
+        while True:
+
+            event = event_queue.get()
+
+            # Re-raise any failure forwarded by the reader thread
+            if isinstance(event, BaseException):
+                reader_thread.join()
+                raise event
+
+            # None marks that all requested events were read
+            if event is None:
+                break
+
+            # False marks end of file
             if not event:
-                if self.progress_bar:
+                if pbar is not None:
+                    pbar.update(n_since_update)
+                    n_since_update = 0
                     nstop = pbar.n
-                    pbar.close()
                     print('End of {} file at event {} '.format(self.reader_type, nstop))
                 else:
                     print('End of {} file.'.format(self.reader_type))
@@ -173,26 +252,72 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
 
             # Print and store basic event info
             self.get_event_info(event)
-            
+
             # Call user-defined function to analyze event
             self.analyze_event(event)
-            if self.progress_bar:
-                pbar.update()
+            if pbar is not None:
+                n_since_update += 1
+                if n_since_update == pbar_batch:
+                    pbar.update(pbar_batch)
+                    n_since_update = 0
+
+        reader_thread.join()
+
+        # Stop the reader: parsing is lazy, so events beyond n_event_max
+        # were never parsed, and this releases the reader's file mappings
+        self.reader.close()
+
+        # Flush any remaining progress
+        if pbar is not None:
+            pbar.update(n_since_update)
+            pbar.close()
 
         # Write analysis task output to ROOT file
         self.write_output_objects()
 
+    # ---------------------------------------------------------------
+    # Producer for the event pipeline: run the reader and put each event
+    # on the queue, forwarding the reader's False end-of-file marker and
+    # appending a None sentinel once all requested events were read
+    #
+    # If the reader raises (e.g. a truncated input file), the exception
+    # is forwarded through the queue so the consumer re-raises it
+    # instead of blocking forever on an empty queue
+    # ---------------------------------------------------------------
+    def read_events(self, event_queue):
+
+        try:
+            for event in self.reader(n_events=self.n_event_max):
+                event_queue.put(event)
+                if not event:
+                    return
+            event_queue.put(None)
+        except BaseException as exception:
+            event_queue.put(exception)
+
     # ---------------------------------------------------------------
     # Initialize output objects
     # ---------------------------------------------------------------
     def initialize_output_objects(self):
 
+        # List of output objects to be written to file, populated via register_output_object()
+        self.output_objects = []
+
         # Event histograms
         self.hNevents = ROOT.TH1F('hNevents', 'hNevents', self.n_pt_hat_bins, 0, self.n_pt_hat_bins)
         self.hCrossSection = ROOT.TH1F('hCrossSection', 'hCrossSection', self.n_pt_hat_bins, 0, self.n_pt_hat_bins)
-        
+        self.register_output_object(self.hNevents)
+        self.register_output_object(self.hCrossSection)
+
         # Initialize user-defined output objects
         self.initialize_user_output_objects()
+
+    # ---------------------------------------------------------------
+    # Register an output object to be written to file
+    # ---------------------------------------------------------------
+    def register_output_object(self, obj):
+
+        self.output_objects.append(obj)
         
     # ---------------------------------------------------------------
     # Get event info
@@ -225,20 +350,22 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
         # Set N events
         self.hNevents.SetBinContent(self.pt_hat_bin+1, self.event_id)
 
-        # Save output objects
+        # Save output objects -- those registered explicitly, plus any ROOT
+        # histograms/trees that a user class stored as an instance attribute
+        # without registering. Scanning self.__dict__ rather than dir(self)
+        # avoids triggering pyroot's lazy attribute lookup on the class
+        output_objects = list(self.output_objects)
+        types = (ROOT.TH1, ROOT.THnBase, ROOT.TTree)
+        for obj in self.__dict__.values():
+            if isinstance(obj, types) and not any(obj is registered for registered in output_objects):
+                output_objects.append(obj)
+
         outputfilename = os.path.join(self.output_dir_bin, 'AnalysisResults.root')
         fout = ROOT.TFile(outputfilename, 'recreate')
         fout.cd()
-        for attr in dir(self):
-
-            obj = getattr(self, attr)
-
-            # Write all ROOT histograms and trees to file
-            types = (ROOT.TH1, ROOT.THnBase, ROOT.TTree)
-            if isinstance(obj, types):
-                obj.Write()
-                obj.SetDirectory(0)
-                del obj
+        for obj in output_objects:
+            obj.Write()
+            obj.SetDirectory(0)
 
         fout.Close()
         
@@ -249,26 +376,53 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
     # Similarly, we find the cross-section manually for ascii format.
     # ---------------------------------------------------------------
     def cross_section(self):
-        
-        # Fill array of cross-sections
-        cross_sections = []
-        with open(self.input_file, 'r') as infile:
-            for line in infile:
-            
-                if self.reader_type == 'hepmc':
-                    if 'GenCrossSection' in line:
-                        split = line.split()
-                        xsec = float(split[3]) / 1e9
-                        cross_sections.append(xsec)
-            
-                elif self.reader_type == 'ascii':
-                    if 'sigmaGen' in line:
-                        split = line.split()
-                        xsec = float(split[2])
-                        cross_sections.append(xsec)
-
-        # Return cross-section with last event's value, which is most accurate
-        return cross_sections[-1]
+
+        # Return the cached value, if this bin's cross-section was already found
+        if self.xsec is not None:
+            return self.xsec
+
+        # If the reader saw a cross-section record during its primary pass
+        # (the scan is fused with the parse), use it
+        last_xsec = getattr(self.reader, 'last_xsec', None)
+        if last_xsec is not None:
+            self.xsec = last_xsec
+
+        # Otherwise, read only the tail of the file -- the last record is the most
+        # accurate, so there is no need to re-scan the entire file to find it
+        elif self.reader_type == 'hepmc':
+            line = self.tail_grep(self.input_file, 'GenCrossSection')
+            self.xsec = float(line.split()[3]) / 1e9
+        elif self.reader_type == 'ascii':
+            line = self.tail_grep(self.input_file, 'sigmaGen')
+            self.xsec = float(line.split()[2])
+
+        return self.xsec
+
+    # ---------------------------------------------------------------
+    # Return the last line of the file containing the given pattern,
+    # scanning backwards from the end of the file
+    # ---------------------------------------------------------------
+    def tail_grep(self, path, pattern, tail=65536):
+
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+
+            # The last record usually sits within the initial window, but it
+            # precedes the final event's particle listing, which can exceed it
+            # for large events -- so double the window until the pattern is
+            # found or the whole file has been scanned
+            while True:
+                f.seek(max(size - tail, 0))
+                lines = f.read().decode(errors='ignore').splitlines()
+
+                for line in reversed(lines):
+                    if pattern in line:
+                        return line
+
+                if tail >= size:
+                    sys.exit('Could not find {} in {}'.format(pattern, path))
+                tail *= 2
    
     # ---------------------------------------------------------------
     # Fill hadrons into vector of fastjet pseudojets
@@ -285,6 +439,27 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
         
         return fj_particles
 
+    # ---------------------------------------------------------------
+    # Fill hadrons into vector of fastjet pseudojets, directly from the
+    # structured array of particles produced by the ascii reader
+    #
+    # This avoids constructing a HepMC particle object per hadron --
+    # the selection runs in a compiled numba kernel instead
+    # ---------------------------------------------------------------
+    def fill_fastjet_constituents_from_array(self, event_hadrons, min_track_pt=0.):
+
+        px, py, pz, e = select_final_state_hadrons(event_hadrons['particle_ID'],
+                                                   event_hadrons['E'],
+                                                   event_hadrons['px'],
+                                                   event_hadrons['py'],
+                                                   event_hadrons['pz'],
+                                                   min_track_pt)
+
+        # Create a vector of fastjet::PseudoJets from arrays of px,py,pz,e
+        fj_particles = fjext.vectorize_px_py_pz_e(px, py, pz, e)
+
+        return fj_particles
+
     # ---------------------------------------------------------------
     # This function is called once per setting
     # You must implement this
@@ -298,3 +473,56 @@ class AnalyzeJetscapeEvents_Base(common_base.CommonBase):
     # ---------------------------------------------------------------
     def analyze_event(self, event):
         raise NotImplementedError('You must implement analyze_event()!')
+
+# ---------------------------------------------------------------
+# Select final-state hadrons from the particle column arrays
+# produced by the ascii reader
+#
+# Removes neutrinos and applies the min-pt cut, returning the
+# kinematic arrays to be handed to fastjet. The input columns may be
+# float32 (as stored by the ascii reader); the outputs are float64,
+# since fastjet uses double precision internally
+# ---------------------------------------------------------------
+@jit(nopython=True, cache=True)
+def select_final_state_hadrons(particle_ID, e_in, px_in, py_in, pz_in, min_track_pt):
+
+    n_hadrons = len(particle_ID)
+    px = np.empty(n_hadrons)
+    py = np.empty(n_hadrons)
+    pz = np.empty(n_hadrons)
+    e = np.empty(n_hadrons)
+
+    count = 0
+    for i in range(n_hadrons):
+
+        pid = particle_ID[i]
+        if pid == 12 or pid == 14 or pid == 16: # Remove neutrinos
+            continue
+
+        px_i = px_in[i]
+        py_i = py_in[i]
+        pt = np.sqrt(px_i * px_i + py_i * py_i)
+        if pt > min_track_pt:
+            px[count] = px_i
+            py[count] = py_i
+            pz[count] = pz_in[i]
+            e[count] = e_in[i]
+            count += 1
+
+    return px[:count], py[:count], pz[:count], e[:count]
+
+# ---------------------------------------------------------------
+# Warm the numba kernels on a dummy particle array, so that worker
+# processes load the cached compilation rather than JIT-compiling
+# on their first event
+# ---------------------------------------------------------------
+def warm_kernels():
+
+    # Warm on column views of a structured array with the reader's layout, so
+    # that the cached compilation has the same strided-view signature as the
+    # real calls (a contiguous warm-up would trigger a re-JIT on first use)
+    dtype = np.dtype([(name, np.int32 if name in reader_ascii.INTEGER_COLUMNS else np.float32)
+                      for name in reader_ascii.PARTICLE_COLUMNS])
+    zeros = np.zeros(2, dtype=dtype)
+    select_final_state_hadrons(zeros['particle_ID'], zeros['E'],
+                               zeros['px'], zeros['py'], zeros['pz'], 0.)
@@ -250,7 +250,7 @@ class AnalyzeJetscapeEvents_BasePHYS(common_base.CommonBase):
 # ---------------------------------------------------------------
 # Construct charged particle mask
 # ---------------------------------------------------------------
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def get_charged_mask(pid, select_charged):
 
     # Default to an all true mask
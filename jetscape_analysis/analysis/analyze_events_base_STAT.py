@@ -302,7 +302,7 @@ class AnalyzeJetscapeEvents_BaseSTAT(common_base.CommonBase):
 # ---------------------------------------------------------------
 # Construct charged particle mask
 # ---------------------------------------------------------------
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def get_charged_mask(pid, select_charged: bool):
     """ Create mask for selected a set of charged particles based on PID.
 
@@ -333,7 +333,7 @@ def get_charged_mask(pid, select_charged: bool):
     return charged_mask
 
 
-@jit(nopython=True)  # type: ignore
+@jit(nopython=True, cache=True)  # type: ignore
 def dphi_in_range_for_hadron_correlations(dphi: float, min_phi: float = -np.pi / 2, max_phi: float = 3 * np.pi / 2) -> float:
     """ Put dphi in range min_phi <= dphi < max_phi
 
@@ -14,6 +14,9 @@ import os
 import argparse
 import yaml
 
+# Analysis
+import numpy as np
+
 # Fastjet via python (from external library heppy)
 import fastjet as fj
 import ROOT
@@ -71,12 +74,14 @@ class AnalyzeJetscapeEvents_Example(analyze_events_base.AnalyzeJetscapeEvents_Ba
     # ---------------------------------------------------------------
     def analyze_event(self, event):
 
-        # Get list of hadrons from the event, and fill some histograms
-        hadrons = event.hadrons(min_track_pt=self.min_track_pt)
-        self.fill_hadron_histograms(hadrons)
+        # Fill some histograms directly from the event's particle columns
+        self.fill_hadron_histograms(event)
 
-        # Create list of fastjet::PseudoJets
-        fj_hadrons = self.fill_fastjet_constituents(hadrons)
+        # Create list of fastjet::PseudoJets -- the per-hadron selection runs
+        # in a compiled kernel on the particle columns, rather than building
+        # a HepMC particle per hadron in a Python loop
+        fj_hadrons = self.fill_fastjet_constituents_from_array(event.event_hadrons,
+                                                               min_track_pt=self.min_track_pt)
 
         # Loop through specified jet R
         for jetR in self.jetR_list:
@@ -99,18 +104,17 @@ class AnalyzeJetscapeEvents_Example(analyze_events_base.AnalyzeJetscapeEvents_Ba
     # ---------------------------------------------------------------
     # Fill hadron histograms
     # ---------------------------------------------------------------
-    def fill_hadron_histograms(self, hadrons):
-    
-        # Loop through hadrons
-        for hadron in hadrons:
+    def fill_hadron_histograms(self, event):
+
+        # Select charged hadrons (pi+, K+, p+, Sigma+, Sigma-, Xi-, Omega-)
+        charged = np.isin(np.abs(event.particle_ID), [211, 321, 2212, 3222, 3112, 3312, 3334])
 
-            # Fill some basic hadron info
-            pid = hadron.pid
-            pt = hadron.momentum.pt()
+        pt = np.sqrt(np.square(event.px[charged]) + np.square(event.py[charged]))
+        pt = pt[pt > self.min_track_pt].astype(np.float64)
 
-            # Fill charged hadron histograms (pi+, K+, p+, Sigma+, Sigma-, Xi-, Omega-)
-            if abs(pid) in [211, 321, 2212, 3222, 3112, 3312, 3334]:
-                getattr(self, 'hChHadronPt').Fill(pt, 1/pt) # Fill with weight 1/pt, to form 1/pt dN/dpt
+        # Fill with weight 1/pt, to form 1/pt dN/dpt
+        if len(pt):
+            getattr(self, 'hChHadronPt').FillN(len(pt), pt, 1/pt)
     
     # ---------------------------------------------------------------
     # Fill jet histograms
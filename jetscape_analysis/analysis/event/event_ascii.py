@@ -21,10 +21,22 @@ class EventAscii(event_base.EventBase):
     # ---------------------------------------------------------------
     def __init__(self, event_hadrons=None, event_partons=None, **kwargs):
         super(EventAscii, self).__init__(**kwargs)
-        
+
         self.event_hadrons = event_hadrons
         self.event_partons = event_partons
 
+        # Column views into the contiguous structured hadron array produced
+        # by the ascii reader, so that consumers can select particles with
+        # vectorized numpy operations instead of looping per particle
+        # (particle_ID and status are exact int32, the kinematics float32)
+        if getattr(event_hadrons, 'dtype', None) is not None and event_hadrons.dtype.names:
+            self.particle_ID = event_hadrons['particle_ID']
+            self.status = event_hadrons['status']
+            self.E = event_hadrons['E']
+            self.px = event_hadrons['px']
+            self.py = event_hadrons['py']
+            self.pz = event_hadrons['pz']
+
     # ---------------------------------------------------------------
     # Get list of hadrons.
     # ---------------------------------------------------------------
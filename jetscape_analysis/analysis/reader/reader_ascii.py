@@ -8,10 +8,10 @@
 
 from __future__ import print_function
 
+import mmap
 import os
 import sys
 import numpy as np
-import pandas as pd
 
 # Event class
 from event import event_ascii
@@ -19,6 +19,11 @@ from event import event_ascii
 # Base class
 from reader import reader_base
 
+# Column layout of the JETSCAPE final-state ascii files (hadrons and partons);
+# files with fewer columns use the leading subset
+PARTICLE_COLUMNS = ['index', 'particle_ID', 'status', 'E', 'px', 'py', 'pz', 'eta', 'phi']
+INTEGER_COLUMNS = ['index', 'particle_ID', 'status']
+
 ################################################################
 class ReaderAscii(reader_base.ReaderBase):
 
@@ -27,59 +32,135 @@ class ReaderAscii(reader_base.ReaderBase):
     # ---------------------------------------------------------------
     def __init__(self, input_file_hadrons='', input_file_partons='', **kwargs):
         super(ReaderAscii, self).__init__(**kwargs)
-        
-        self.event_list_hadrons = self.parse_event(input_file_hadrons)
+
+        # Open the hadron file here, so that a bad path fails fast
+        self.event_generator_hadrons = self.parse_event(open(input_file_hadrons, 'rb'))
         self.current_event = 0
-        self.n_events = len(self.event_list_hadrons)
-        
-        if os.path.exists(input_file_partons):
-            self.event_list_partons = self.parse_event(input_file_partons)
-        else:
-            self.event_list_partons = None
 
-        if os.path.exists(input_file_hadrons) and os.path.exists(input_file_partons):
-            if len(self.event_list_hadrons) != len(self.event_list_partons):
-                sys.exit('Final state partons has {} events, but partons has {}.'.format(len(self.event_list_hadrons), len(self.event_list_partons)))
-  
+        # Last cross-section seen while parsing, if the file contains any
+        self.last_xsec = None
+
+        # The parton file is opened lazily, on the first next_event() call
+        self.input_file_partons = input_file_partons
+        self.event_generator_partons = None
+        self.partons_opened = False
+
     # ---------------------------------------------------------------
-    # Parse the file into a list of events, each consisting of a list of lines
+    # Generator that parses an open (binary) file one event at a time,
+    # yielding a structured array with one row per particle
     # (applied separately for final-state hadrons and partons)
+    #
+    # Streaming one event at a time keeps peak memory at O(one event)
+    # rather than holding every event's particles in RAM simultaneously
     # ---------------------------------------------------------------
-    def parse_event(self, input_file):
-
-        event_list = []
-        event = None
-        with open(input_file, 'r') as f:
-            for line in f.readlines():
-                            
-                # If a new event, write the previous event and then clear it
-                if line.startswith('#'):
-                    if event:
-                        event_list.append(event)
-                    event = []
-                    
+    def parse_event(self, f):
+
+        # Memory-map the file, so the scan operates on a zero-copy view of the
+        # kernel page cache with no per-line string construction at all
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            size = len(mm)
+
+            # Offset of the first event delimiter ('#' at the start of a line)
+            if mm[:1] == b'#':
+                header = 0
+            else:
+                pos = mm.find(b'\n#')
+                header = pos + 1 if pos != -1 else -1
+
+            while header != -1:
+
+                header_end = mm.find(b'\n', header)
+                if header_end == -1:
+                    header_end = size
+                header_line = mm[header:header_end]
+                if b'sigmaGen' in header_line:
+                    self.last_xsec = float(header_line.split()[2])
+
+                # The event's particle block extends to the next delimiter (or EOF)
+                pos = mm.find(b'\n#', header_end)
+                if pos == -1:
+                    block_end = size
+                    header = -1
                 else:
-                    event.append(np.array(line.rstrip('\n').split(), dtype=float))
-                                    
-            # Write the last event
-            event_list.append(event)
-        
-        return event_list
-        
+                    block_end = pos + 1
+                    header = pos + 1
+
+                block = mm[header_end + 1:block_end]
+                if block.strip():
+                    yield self.parse_block(block)
+
+        finally:
+            mm.close()
+
+    # ---------------------------------------------------------------
+    # Parse a block of particle lines into a single structured array with
+    # one numpy C-level parse, rather than constructing a tiny array per
+    # line -- the per-particle Python tokenization dominates for large files
+    # ---------------------------------------------------------------
+    def parse_block(self, block):
+
+        n_cols = len(block.split(b'\n', 1)[0].split())
+        values = np.fromstring(block, sep=' ', dtype=np.float64).reshape(-1, n_cols)
+
+        # Downcast per column: the index/ID/status columns must stay exact
+        # integers (PDG codes for light nuclei exceed float32 precision, e.g.
+        # the deuteron's 1000010020 -- cf. the int32 cast in parse_ascii),
+        # while float32 is ample for the kinematics and halves their size
+        names = PARTICLE_COLUMNS[:n_cols]
+        dtype = np.dtype([(name, np.int32 if name in INTEGER_COLUMNS else np.float32) for name in names])
+        event = np.empty(values.shape[0], dtype=dtype)
+        for i, name in enumerate(names):
+            event[name] = values[:, i]
+
+        return event
+
     # ---------------------------------------------------------------
     # Get next event
     # Return event if successful, False if unsuccessful
     # ---------------------------------------------------------------
     def next_event(self):
 
-        if self.current_event < self.n_events:
-            self.current_event += 1
-            event_hadrons = self.event_list_hadrons[self.current_event-1]
-            if self.event_list_partons:
-                event_partons = self.event_list_partons[self.current_event-1]
-            else:
-                event_partons = ''
-            return event_ascii.EventAscii(event_hadrons, event_partons)
+        # Open the parton stream on first use -- try to open rather than
+        # pre-checking existence, so that there is no check-then-open race
+        # and a run without a parton file simply proceeds without partons
+        if not self.partons_opened:
+            self.partons_opened = True
+            try:
+                self.event_generator_partons = self.parse_event(open(self.input_file_partons, 'rb'))
+            except (FileNotFoundError, IsADirectoryError):
+                self.event_generator_partons = None
+
+        event_hadrons = next(self.event_generator_hadrons, None)
+        if event_hadrons is None:
+            # The streams must end together: a hadron file that ends while
+            # partons continue (e.g. truncated by a killed job) is an error
+            if self.event_generator_partons and next(self.event_generator_partons, None) is not None:
+                sys.exit('Final state hadrons ended at event {}, but partons continue.'.format(self.current_event))
+            return False
+        self.current_event += 1
+
+        if self.event_generator_partons:
+            event_partons = next(self.event_generator_partons, None)
+            if event_partons is None:
+                sys.exit('Final state partons ended at event {}, but hadrons continue.'.format(self.current_event))
         else:
-            sys.exit('Current event {} greater than total n_events {}'.format(self.current_event,
-                                                                              self.n_events))
+            event_partons = ''
+
+        return event_ascii.EventAscii(event_hadrons, event_partons)
+
+    # ---------------------------------------------------------------
+    # Stop parsing and release the memory-mapped inputs
+    #
+    # Since parsing is lazy, any events beyond the last one consumed
+    # are simply never parsed
+    # ---------------------------------------------------------------
+    def close(self):
+
+        self.event_generator_hadrons.close()
+        if self.event_generator_partons:
+            self.event_generator_partons.close()
@@ -27,3 +27,9 @@ class ReaderBase(common_base.CommonBase):
 
         for i in range(0, n_events):
             yield self.next_event()
+
+    # ---------------------------------------------------------------
+    # Release any resources held by the reader (no-op by default)
+    # ---------------------------------------------------------------
+    def close(self):
+        pass
@@ -0,0 +1,199 @@
+""" Tests for the legacy streaming ascii reader.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# The legacy reader and event modules use plain imports resolved relative to
+# the analysis directory, so add it to the path (as the analysis scripts do).
+_here = Path(__file__).parent
+sys.path.insert(0, str(_here.parent / "jetscape_analysis" / "analysis"))
+
+# EventAscii imports pyhepmc_ng at module level, but only needs it to build
+# HepMC particles, which these tests don't exercise. Stub it if unavailable.
+try:
+    import pyhepmc_ng  # noqa: F401
+except ImportError:
+    sys.modules["pyhepmc_ng"] = types.ModuleType("pyhepmc_ng")
+
+from reader import reader_ascii  # noqa: E402
+
+# Sample JETSCAPE output shipped with the repo
+_fixture_dir = _here.parent / "test" / "PbPb" / "output" / "latest" / "0_Q01.0_recoil_on0_broadening_on0_qhat0-2.0"
+_hadron_file = _fixture_dir / "FinalStateHadrons.txt"
+_parton_file = _fixture_dir / "FinalStatePartons.txt"
+
+
+def _reference_parse(path: Path) -> list:
+    """ Parse a final-state file with the original per-line logic, as a reference. """
+    events = []
+    event = None
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#"):
+                if event:
+                    events.append(np.array(event, dtype=np.float64))
+                event = []
+            else:
+                event.append([float(value) for value in line.split()])
+        if event:
+            events.append(np.array(event, dtype=np.float64))
+    return events
+
+
+def _stream_events(reader: reader_ascii.ReaderAscii, n_events: int = 1000) -> list:
+    """ Pull events from the reader until end of file. """
+    events = []
+    for event in reader(n_events=n_events):
+        if not event:
+            break
+        events.append(event)
+    return events
+
+
+def test_streamed_events_match_reference() -> None:
+    reader = reader_ascii.ReaderAscii(str(_hadron_file), str(_parton_file))
+    events = _stream_events(reader)
+
+    reference_hadrons = _reference_parse(_hadron_file)
+    reference_partons = _reference_parse(_parton_file)
+    assert len(events) == len(reference_hadrons) == 10
+
+    for event, ref_hadrons, ref_partons in zip(events, reference_hadrons, reference_partons):
+        for particles, reference in [(event.event_hadrons, ref_hadrons), (event.event_partons, ref_partons)]:
+            assert len(particles) == reference.shape[0]
+            # Identifier columns are exact int32; kinematics are float32
+            assert particles.dtype["particle_ID"] == np.int32
+            assert particles.dtype["E"] == np.float32
+            assert np.array_equal(particles["index"], reference[:, 0].astype(np.int32))
+            assert np.array_equal(particles["particle_ID"], reference[:, 1].astype(np.int32))
+            assert np.array_equal(particles["status"], reference[:, 2].astype(np.int32))
+            for column, name in [(3, "E"), (4, "px"), (5, "py"), (6, "pz"), (7, "eta"), (8, "phi")]:
+                assert np.array_equal(particles[name], reference[:, column].astype(np.float32))
+
+
+def test_column_views() -> None:
+    reader = reader_ascii.ReaderAscii(str(_hadron_file), str(_parton_file))
+    event = reader.next_event()
+
+    # The EventAscii columns are zero-copy views into the event array
+    assert np.shares_memory(event.E, event.event_hadrons)
+    assert np.array_equal(event.particle_ID, event.event_hadrons["particle_ID"])
+    assert np.array_equal(event.pz, event.event_hadrons["pz"])
+
+    # Positional row indexing still works, as used by EventAscii.particles()
+    particle = next(iter(event.event_hadrons))
+    assert int(particle[1]) == event.particle_ID[0]
+
+
+def test_large_pdg_codes_are_exact(tmp_path: Path) -> None:
+    # PDG codes for light nuclei exceed float32 precision and must survive exactly
+    input_file = tmp_path / "hadrons.txt"
+    input_file.write_text(
+        "# Event 1\n"
+        "0 1000010020 0 2.0 0.5 0.5 0.2 0 0\n"
+        "1 1000020030 -1 3.0 0.1 0.1 0.2 0 0\n"
+    )
+    reader = reader_ascii.ReaderAscii(str(input_file), str(tmp_path / "none"))
+    event = reader.next_event()
+    assert list(event.particle_ID) == [1000010020, 1000020030]
+    assert list(event.status) == [0, -1]
+
+
+def test_last_xsec_capture(tmp_path: Path) -> None:
+    input_file = tmp_path / "hadrons.txt"
+    input_file.write_text(
+        "# Event 1\n"
+        "0 211 0 1 2 3 4 5 6\n"
+        "# Event 2\n"
+        "1 321 0 9 8 7 6 5 4\n"
+        "# sigmaGen 0.5\n"
+        "# sigmaGen 0.7"
+    )
+    reader = reader_ascii.ReaderAscii(str(input_file), str(tmp_path / "none"))
+    events = _stream_events(reader)
+    assert len(events) == 2
+    assert reader.last_xsec == 0.7
+
+
+def test_missing_parton_file() -> None:
+    reader = reader_ascii.ReaderAscii(str(_hadron_file), str(_fixture_dir / "does_not_exist.txt"))
+    event = reader.next_event()
+    assert len(event.event_hadrons) > 0
+    assert event.event_partons == ""
+
+
+def test_empty_file(tmp_path: Path) -> None:
+    input_file = tmp_path / "hadrons.txt"
+    input_file.write_text("")
+    reader = reader_ascii.ReaderAscii(str(input_file), str(tmp_path / "none"))
+    assert reader.next_event() is False
+
+
+def test_truncated_file_raises(tmp_path: Path) -> None:
+    # A file cut off mid-row (e.g. from a killed batch job) must fail loudly
+    input_file = tmp_path / "hadrons.txt"
+    input_file.write_text(
+        "# Event 1\n"
+        "0 211 0 1 2 3 4 5 6\n"
+        "1 321 0 9 8"
+    )
+    reader = reader_ascii.ReaderAscii(str(input_file), str(tmp_path / "none"))
+    with pytest.raises(ValueError):
+        reader.next_event()
+
+
+def test_parton_file_ending_early_exits() -> None:
+    # The parton stream is pulled in lockstep; a premature end is an error
+    reader = reader_ascii.ReaderAscii(str(_hadron_file), str(_hadron_file))
+    # Exhaust the parton generator so it ends before the hadron stream
+    reader.next_event()
+    reader.event_generator_partons.close()
+    with pytest.raises(SystemExit):
+        reader.next_event()
+
+
+def test_hadron_file_ending_early_exits(tmp_path: Path) -> None:
+    # The converse mismatch: a hadron stream ending while partons continue
+    hadron_file = tmp_path / "hadrons.txt"
+    hadron_file.write_text(
+        "# Event 1\n"
+        "0 211 0 1 2 3 4 5 6\n"
+    )
+    parton_file = tmp_path / "partons.txt"
+    parton_file.write_text(
+        "# Event 1\n"
+        "0 21 0 1 2 3 4 5 6\n"
+        "# Event 2\n"
+        "1 21 0 9 8 7 6 5 4\n"
+    )
+    reader = reader_ascii.ReaderAscii(str(hadron_file), str(parton_file))
+    reader.next_event()
+    with pytest.raises(SystemExit):
+        reader.next_event()
+
+
+def test_early_stop_and_close() -> None:
+    reader = reader_ascii.ReaderAscii(str(_hadron_file), str(_parton_file))
+
+    # Count how many blocks are actually parsed when only 3 events are consumed
+    n_parsed = 0
+    parse_block = reader.parse_block
+
+    def counting_parse_block(block):
+        nonlocal n_parsed
+        n_parsed += 1
+        return parse_block(block)
+
+    reader.parse_block = counting_parse_block
+    events = _stream_events(reader, n_events=3)
+    reader.close()
+
+    assert len(events) == 3
+    # Parsing is lazy: only the consumed events (plus one block of lookahead
+    # per stream) are parsed, not all 20 blocks in the two files
+    assert n_parsed <= 8